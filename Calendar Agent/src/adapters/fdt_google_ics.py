@@ -1,22 +1,129 @@
+import atexit
+import json
 import os
 import re
+import threading
+import time
 import requests
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
 from typing import Optional
 from icalendar import Calendar
 from dateutil import tz
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Optional fuzzy matcher for the local symbol universe; lookups fall back to
+# exact-name matching (and then Alpha Vantage) when it isn't installed.
+try:
+    from rapidfuzz import process as _rf_process
+except ImportError:
+    _rf_process = None
 
 # Returned dataframe columns (adds 'summary' so we can store blanks usefully)
 SCHEMA_COLUMNS = ["ticker", "pdufa_date", "summary"]
 
+# Shared session so repeated hits on the same hosts (alphavantage.co, Google ICS)
+# reuse keep-alive connections instead of paying TCP+TLS setup per request.
+_SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+)
+_SESSION.mount("http://", _adapter)
+_SESSION.mount("https://", _adapter)
+
 # Rule 1: 3–5 uppercase letters at the START of SUMMARY => ticker (excluding trivial words)
 LEADING_TICKER_RE = re.compile(r"^\s*([A-Z]{3,5})\b")
 STOPWORDS = {"PDUFA", "ADCOM", "FDA"}
 
-def fetch_ics(url: str) -> Calendar:
-    r = requests.get(url, timeout=30)
+def fetch_ics(url: str) -> str:
+    """Download an ICS feed and return its decoded text."""
+    r = _SESSION.get(url, timeout=30)
     r.raise_for_status()
-    return Calendar.from_ical(r.content)
+    return r.text
+
+# ---- Streaming ICS parse ----
+# Calendar.from_ical builds a full component tree in pure Python; we only need
+# SUMMARY and DTSTART per VEVENT, so a line scan is several times faster on
+# big feeds. Anything the scan doesn't understand raises, and events_to_df
+# falls back to the full icalendar parser.
+_ICS_PROP_RE     = re.compile(r"(SUMMARY|DTSTART)((?:;[^:]*)?):(.*)", re.IGNORECASE)
+_ICS_TZID_RE     = re.compile(r";TZID=([^;:]+)", re.IGNORECASE)
+_ICS_DATE_RE     = re.compile(r"\d{8}")
+_ICS_DATETIME_RE = re.compile(r"(\d{8}T\d{6})(Z?)")
+
+def _unescape_ics(value: str) -> str:
+    return re.sub(r"\\([\\;,nN])", lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+def _fast_parse_ics(text: str):
+    """
+    Yield (summary, dtstart_value, dtstart_tzid) per VEVENT from raw ICS text.
+    Unfolds continuation lines and skips nested components (e.g. VALARM);
+    raises ValueError on structure it doesn't understand.
+    """
+    unfolded = []
+    for line in text.splitlines():
+        if line[:1] in (" ", "\t") and unfolded:
+            unfolded[-1] += line[1:]
+        else:
+            unfolded.append(line)
+
+    in_event = False
+    depth = 0
+    summary = dtstart = ""
+    tzid = None
+    for line in unfolded:
+        # Property and component names are case-insensitive per RFC 5545
+        upper = line.upper()
+        if not in_event:
+            if upper == "BEGIN:VEVENT":
+                in_event, depth = True, 0
+                summary = dtstart = ""
+                tzid = None
+            continue
+        if upper.startswith("BEGIN:"):
+            depth += 1
+        elif upper == "END:VEVENT" and depth == 0:
+            yield summary, dtstart, tzid
+            in_event = False
+        elif upper.startswith("END:"):
+            if depth == 0:
+                raise ValueError(f"mismatched {line} inside VEVENT")
+            depth -= 1
+        elif depth == 0:
+            m = _ICS_PROP_RE.match(line)
+            if m:
+                name, params, value = m.group(1).upper(), m.group(2), m.group(3)
+                if name == "SUMMARY":
+                    summary = _unescape_ics(value).strip()
+                else:
+                    dtstart = value.strip()
+                    tm = _ICS_TZID_RE.search(params)
+                    tzid = tm.group(1) if tm else None
+    if in_event:
+        raise ValueError("unterminated VEVENT")
+
+def _raw_to_date_str(value: str, tzid: Optional[str], tzname: Optional[str]) -> str:
+    """Coerce a raw DTSTART value to 'YYYY-MM-DD', mirroring _to_date_str."""
+    if not value:
+        return ""
+    if _ICS_DATE_RE.fullmatch(value):
+        return f"{value[:4]}-{value[4:6]}-{value[6:8]}"
+    m = _ICS_DATETIME_RE.fullmatch(value)
+    if m is None:
+        raise ValueError(f"unrecognized DTSTART value: {value!r}")
+    d = datetime.strptime(m.group(1), "%Y%m%dT%H%M%S")
+    if m.group(2):
+        d = d.replace(tzinfo=tz.UTC)
+    elif tzid:
+        d = d.replace(tzinfo=tz.gettz(tzid))
+    if d.tzinfo is not None and tzname:
+        d = d.astimezone(tz.gettz(tzname))
+    return d.date().isoformat()
 
 def _to_date_str(dtprop, tzname: Optional[str]) -> str:
     """Coerce VEVENT dtstart (date or datetime) to 'YYYY-MM-DD' in target tz if present."""
@@ -32,24 +139,141 @@ def _to_date_str(dtprop, tzname: Optional[str]) -> str:
     except Exception:
         return ""
 
-def _extract_ticker_from_summary(summary: str) -> str:
-    """Exact per your rule: if SUMMARY starts with 3–5 caps letters, that's the ticker (excluding STOPWORDS)."""
-    if not summary:
-        return ""
-    m = LEADING_TICKER_RE.match(summary)
-    if not m:
-        return ""
-    cand = m.group(1).upper()
-    if cand in STOPWORDS:
-        return ""
-    return cand
+# Company->ticker results are cached by normalized summary text so the same
+# issuer never costs more than one Alpha Vantage call, within a run or across
+# runs. Entries are [symbol, epoch]; negative results ("") expire after 24h.
+_CACHE_PATH = Path(__file__).resolve().parents[2] / "data" / "ticker_cache.json"
+_NEGATIVE_TTL = 24 * 3600.0
+
+def _normalize_company_key(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+def _load_ticker_cache() -> dict:
+    # A corrupt or wrong-shaped cache file must never abort a run; start fresh.
+    try:
+        raw = json.loads(_CACHE_PATH.read_text(encoding="utf-8"))
+        now = time.time()
+        return {
+            k: v for k, v in raw.items()
+            if isinstance(v, list) and len(v) == 2
+            and isinstance(v[1], (int, float))
+            and (v[0] or now - v[1] <= _NEGATIVE_TTL)
+        }
+    except Exception:
+        return {}
+
+_TICKER_CACHE = _load_ticker_cache()
+
+def _save_ticker_cache() -> None:
+    try:
+        _CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _CACHE_PATH.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(_TICKER_CACHE, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, _CACHE_PATH)
+    except Exception:
+        pass
+
+atexit.register(_save_ticker_cache)
+
+# ---- Local symbol universe ----
+# The NASDAQ-traded listing covers US exchanges and is refreshed daily; most
+# company names resolve against it in-memory, so Alpha Vantage is only hit
+# for names the universe doesn't know.
+_SYMBOLS_URL     = "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqtraded.txt"
+_SYMBOLS_PATH    = _CACHE_PATH.parent / "nasdaqtraded.txt"
+_SYMBOLS_MAX_AGE = 24 * 3600.0
+_FUZZY_CUTOFF    = 85
+
+_SYMBOL_INDEX: Optional[dict] = None
+_SYMBOL_INDEX_LOCK = threading.Lock()
+
+def _load_symbol_universe() -> dict:
+    """Return {normalized issuer name: symbol}, refreshing the cached listing daily."""
+    text = None
+    try:
+        if _SYMBOLS_PATH.exists() and time.time() - _SYMBOLS_PATH.stat().st_mtime <= _SYMBOLS_MAX_AGE:
+            text = _SYMBOLS_PATH.read_text(encoding="utf-8")
+        else:
+            r = _SESSION.get(_SYMBOLS_URL, timeout=30)
+            r.raise_for_status()
+            text = r.text
+            _SYMBOLS_PATH.parent.mkdir(parents=True, exist_ok=True)
+            tmp = _SYMBOLS_PATH.with_suffix(".txt.tmp")
+            tmp.write_text(text, encoding="utf-8")
+            os.replace(tmp, _SYMBOLS_PATH)
+    except Exception:
+        # A stale listing still beats the network fallback per event.
+        if _SYMBOLS_PATH.exists():
+            try:
+                text = _SYMBOLS_PATH.read_text(encoding="utf-8")
+            except Exception:
+                text = None
+    if not text:
+        return {}
+
+    index: dict = {}
+    # Pipe-separated: Nasdaq Traded|Symbol|Security Name|...; trailer line has no pipes.
+    for line in text.splitlines()[1:]:
+        parts = line.split("|")
+        if len(parts) < 3 or parts[0] != "Y":
+            continue
+        sym = parts[1].strip().upper()
+        # Strip the share-class suffix, e.g. "Acme Inc. - Common Stock"
+        key = _normalize_company_key(parts[2].split(" - ")[0])
+        if sym and key:
+            index.setdefault(key, sym)
+    return index
+
+def _symbol_index() -> dict:
+    global _SYMBOL_INDEX
+    if _SYMBOL_INDEX is None:
+        with _SYMBOL_INDEX_LOCK:
+            if _SYMBOL_INDEX is None:
+                _SYMBOL_INDEX = _load_symbol_universe()
+    return _SYMBOL_INDEX
+
+# The lookups run from a small thread pool since they are pure network I/O.
+# Alpha Vantage's free tier allows 5 requests/minute; each in-flight token is
+# held for the full window after the call so we never start more than that.
+# The pool is sized to the rate limit — extra workers could only block on it.
+_AV_RATE_LIMIT  = 5
+_AV_RATE_WINDOW = 60.0
+_AV_MAX_WORKERS = _AV_RATE_LIMIT
+_AV_SEMAPHORE   = threading.Semaphore(_AV_RATE_LIMIT)
+
+def _release_av_token_later() -> None:
+    t = threading.Timer(_AV_RATE_WINDOW, _AV_SEMAPHORE.release)
+    t.daemon = True
+    t.start()
 
 def _lookup_ticker_online(company_text: str, debug: bool = False) -> str:
     """
-    Online company->ticker lookup using Alpha Vantage SYMBOL_SEARCH.
-    Set ALPHAVANTAGE_API_KEY in env (or GitHub Secret).
-    Returns symbol or "" if not found.
+    Company->ticker lookup. Tries, in order: the persistent cache, the local
+    NASDAQ-traded universe (exact then fuzzy), and finally Alpha Vantage
+    SYMBOL_SEARCH (needs ALPHAVANTAGE_API_KEY in env / GitHub Secret).
+    Returns symbol or "" if not found. Results are cached (see _TICKER_CACHE).
     """
+    cache_key = _normalize_company_key(company_text)
+    cached = _TICKER_CACHE.get(cache_key)
+    if cached is not None:
+        if debug:
+            print("[LOOKUP] cache hit:", company_text, "->", cached[0] or "(no match)")
+        return cached[0]
+
+    symbols = _symbol_index()
+    if symbols:
+        sym = symbols.get(cache_key)
+        if not sym and _rf_process is not None:
+            match = _rf_process.extractOne(cache_key, symbols.keys(), score_cutoff=_FUZZY_CUTOFF)
+            if match:
+                sym = symbols[match[0]]
+        if sym:
+            if debug:
+                print("[LOOKUP] local universe:", company_text, "->", sym)
+            _TICKER_CACHE[cache_key] = [sym, time.time()]
+            return sym
+        # A local miss isn't cached as negative; Alpha Vantage may still know it.
+
     api_key = os.getenv("ALPHAVANTAGE_API_KEY", "").strip()
     if not api_key:
         if debug:
@@ -60,7 +284,13 @@ def _lookup_ticker_online(company_text: str, debug: bool = False) -> str:
     params = {"function": "SYMBOL_SEARCH", "keywords": company_text, "apikey": api_key}
 
     try:
-        r = requests.get(url, params=params, timeout=20)
+        # Only the actual Alpha Vantage request holds a rate token; cache and
+        # local-universe resolutions above never touch the limiter.
+        _AV_SEMAPHORE.acquire()
+        try:
+            r = _SESSION.get(url, params=params, timeout=20)
+        finally:
+            _release_av_token_later()
         r.raise_for_status()
         data = r.json()
     except Exception as e:
@@ -72,6 +302,7 @@ def _lookup_ticker_online(company_text: str, debug: bool = False) -> str:
     if not matches:
         if debug:
             print("[LOOKUP] no matches for:", company_text)
+        _TICKER_CACHE[cache_key] = ["", time.time()]
         return ""
 
     # Prefer US results and stronger name match
@@ -91,72 +322,116 @@ def _lookup_ticker_online(company_text: str, debug: bool = False) -> str:
         if best is None or score > best[0]:
             best = (score, sym)
 
-    return best[1] if best else ""
+    symbol = best[1] if best else ""
+    _TICKER_CACHE[cache_key] = [symbol, time.time()]
+    return symbol
 
 def _company_text(summary: str) -> str:
     """Use the entire SUMMARY text for online search, as requested."""
     return (summary or "").strip()
 
-def events_to_df(cal: Calendar, tzname: Optional[str], debug: bool = False) -> pd.DataFrame:
-    rows = []
-    for component in cal.walk():
-        if component.name != "VEVENT":
-            continue
+# Matches summaries with no letters at all (digits/punctuation only)
+_NON_NAME_RE = re.compile(r"[\W\d]+")
+
+def _worth_online_lookup(summary: str) -> bool:
+    """Cheap pre-filter: skip the API call for text that can't be a company name."""
+    if len(summary) < 3:
+        return False
+    if summary.upper() in STOPWORDS:
+        return False
+    if _NON_NAME_RE.fullmatch(summary):
+        return False
+    return True
 
-        summary = str(component.get("summary", "")).strip()
-        dtstart = component.get("dtstart")
+def events_to_df(ics_text: str, tzname: Optional[str], debug: bool = False) -> pd.DataFrame:
+    # Fast streaming scan first; any surprise in the feed falls back to the
+    # full icalendar parser so correctness never depends on the shortcut.
+    try:
+        events = [
+            (summary, _raw_to_date_str(dtstart, tzid, tzname))
+            for summary, dtstart, tzid in _fast_parse_ics(ics_text)
+        ]
+    except Exception as e:
+        if debug:
+            print(f"[ICS] fast parse failed ({e}); falling back to icalendar")
+        cal = Calendar.from_ical(ics_text)
+        events = [
+            (str(component.get("summary", "")).strip(), _to_date_str(component.get("dtstart"), tzname))
+            for component in cal.walk("VEVENT")
+        ]
 
-        # Rule 1: leading 3–5 caps letters in SUMMARY
-        ticker = _extract_ticker_from_summary(summary)
-        if not ticker:
-            # Rule 2: search SUMMARY text online as company name
-            ticker = _lookup_ticker_online(_company_text(summary), debug=debug)
+    df = pd.DataFrame(events, columns=["summary", "pdufa_date"])
 
-        pdufa_date = _to_date_str(dtstart, tzname)
-        rows.append({"ticker": ticker, "pdufa_date": pdufa_date, "summary": summary})
+    # Rule 1, vectorized: leading 3–5 caps letters in SUMMARY (excluding STOPWORDS).
+    # The pattern is ^-anchored, so extract's search semantics equal a match.
+    cand = df["summary"].str.extract(LEADING_TICKER_RE, expand=False).fillna("")
+    df["ticker"] = cand.where(~cand.isin(STOPWORDS), "")
 
-        if debug:
+    # Rule 2 lookups in parallel; results land back at their original positions.
+    pending = [
+        i for i, (ticker, summary) in enumerate(zip(df["ticker"], df["summary"]))
+        if not ticker and _worth_online_lookup(summary)
+    ]
+    if pending:
+        summaries = df["summary"].tolist()
+        with ThreadPoolExecutor(max_workers=_AV_MAX_WORKERS) as ex:
+            found = list(ex.map(
+                lambda i: _lookup_ticker_online(_company_text(summaries[i]), debug=debug),
+                pending,
+            ))
+        col = df.columns.get_loc("ticker")
+        for i, ticker in zip(pending, found):
+            df.iat[i, col] = ticker
+
+    if debug:
+        for ticker, pdufa_date, summary in zip(df["ticker"], df["pdufa_date"], df["summary"]):
             print(f"[EVT] SUMMARY='{summary}' -> ticker='{ticker}' | date='{pdufa_date}'")
 
-    df = pd.DataFrame(rows)
-    for c in SCHEMA_COLUMNS:
-        if c not in df.columns:
-            df[c] = ""
-    df = df[SCHEMA_COLUMNS]
     # Keep even blank tickers here; main.py will route them to blank.csv
-    return df
+    return df[SCHEMA_COLUMNS]
+
+def _safe_fetch(url: str, tzname: Optional[str], debug: bool) -> Optional[pd.DataFrame]:
+    """Fetch one ICS feed and convert to a frame; returns None instead of raising."""
+    try:
+        return events_to_df(fetch_ics(url), tzname, debug=debug)
+    except Exception as e:
+        if debug:
+            print(f"[ICS]ERROR fetching {url}: {e}")
+        return None
 
 def fetch_all(ics_urls: list[str],
               tzname: Optional[str] = None,
               min_date: Optional[str] = None,
               max_date: Optional[str] = None,
               debug: bool = False) -> pd.DataFrame:
+    # Each feed is an independent HTTPS GET, so download them concurrently
+    # over the pooled session; order of results matches ics_urls.
     frames = []
-    for u in ics_urls:
-        try:
-            cal = fetch_ics(u)
-            frames.append(events_to_df(cal, tzname, debug=debug))
-        except Exception as e:
-            if debug:
-                print(f"[ICS]ERROR fetching {u}: {e}")
-            continue
+    if ics_urls:
+        with ThreadPoolExecutor(max_workers=min(8, len(ics_urls))) as ex:
+            results = list(ex.map(lambda u: _safe_fetch(u, tzname, debug), ics_urls))
+        frames = [f for f in results if f is not None]
 
     if frames:
         df = pd.concat(frames, ignore_index=True)
     else:
         df = pd.DataFrame(columns=SCHEMA_COLUMNS)
 
-    # Optional date filter
+    # Optional date filter: parse the column once, combine both bounds into a
+    # single keep mask, and slice once at the end.
     if not df.empty:
-        s = pd.to_datetime(df["pdufa_date"], errors="coerce")
+        # _to_date_str guarantees 'YYYY-MM-DD', so an explicit format keeps the parse on the fast path
+        s = pd.to_datetime(df["pdufa_date"], format="%Y-%m-%d", errors="coerce")
+        keep = pd.Series(True, index=df.index)
         if min_date:
             s_min = pd.to_datetime(min_date, errors="coerce")
             if pd.notna(s_min):
-                df = df[s.isna() | (s >= s_min)]
+                keep &= s.isna() | (s >= s_min)
         if max_date:
             s_max = pd.to_datetime(max_date, errors="coerce")
             if pd.notna(s_max):
-                df = df[s.isna() | (s <= s_max)]
+                keep &= s.isna() | (s <= s_max)
+        df = df.loc[keep]
 
     # Deduplicate conservatively (include summary so blanks don't collapse)
     df = df.drop_duplicates(subset=["ticker", "pdufa_date", "summary"], keep="first")
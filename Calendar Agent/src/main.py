@@ -2,7 +2,7 @@ import os
 import re
 import json
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 import pandas as pd
 import yaml
 from dateutil import tz as dttz
@@ -23,11 +23,20 @@ STATE_JSON = DATA / "state.json"
 # Master CSV schema
 CSV_FIELDS = ["ticker", "pdufa_date", "market_cap"]
 
+# Prefer pandas' multi-threaded pyarrow CSV engine when the package is around;
+# the CSVs stay plain text either way so downstream scripts are unaffected.
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
 
 def read_master_df() -> pd.DataFrame:
     """Load the master CSV (resolved only) or return an empty frame with the right columns."""
     if MASTER_CSV.exists():
-        df = pd.read_csv(MASTER_CSV, dtype=str).fillna("")
+        # keep_default_na=False leaves empty fields as "" so no fillna pass is needed
+        df = pd.read_csv(MASTER_CSV, dtype=str, engine=CSV_ENGINE, keep_default_na=False)
         for c in CSV_FIELDS:
             if c not in df.columns:
                 df[c] = ""
@@ -36,36 +45,33 @@ def read_master_df() -> pd.DataFrame:
         return pd.DataFrame(columns=CSV_FIELDS)
 
 
-def upsert(df: pd.DataFrame, row: dict) -> pd.DataFrame:
+def upsert_resolved(df_master: pd.DataFrame, df_resolved: pd.DataFrame) -> pd.DataFrame:
     """
-    Upsert by (ticker, pdufa_date). If pdufa_date is blank, fall back to 'ticker' only.
-    Only fills empty fields on an existing row.
+    Merge newly resolved events into the master frame in one vectorized pass.
+    Keyed by (ticker, pdufa_date); existing rows win so their market_cap is kept.
+    Rows without a date fall back to 'ticker' only, as the old per-row upsert did.
     """
-    key_cols = ["ticker", "pdufa_date"] if row.get("pdufa_date") else ["ticker"]
+    df_new = df_resolved[["ticker", "pdufa_date"]].copy()
+    df_new["market_cap"] = ""
 
-    if df.empty:
-        return pd.concat([df, pd.DataFrame([row])], ignore_index=True)
+    # A dateless event only counts as new if its ticker isn't in the master yet.
+    has_date = df_new["pdufa_date"] != ""
+    df_new = df_new[has_date | ~df_new["ticker"].isin(df_master["ticker"])]
 
-    mask = pd.Series([True] * len(df))
-    for k in key_cols:
-        mask &= (df[k].fillna("") == row.get(k, ""))
+    combined = pd.concat([df_master, df_new[CSV_FIELDS]], ignore_index=True)
+    return combined.drop_duplicates(subset=["ticker", "pdufa_date"], keep="first")
 
-    idx = df[mask].index
-    if len(idx) == 0:
-        return pd.concat([df, pd.DataFrame([row])], ignore_index=True)
-    else:
-        i = idx[0]
-        for k, v in row.items():
-            if k in df.columns and v and (not str(df.at[i, k]).strip()):
-                df.at[i, k] = v
-        return df
+
+def _write_csv_atomic(df: pd.DataFrame, path: Path) -> None:
+    """Write via a temp file + os.replace so a crash mid-write can't corrupt the CSV."""
+    tmp = path.with_suffix(".tmp.csv")
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
 
 
-def _date_key(x: str):
-    try:
-        return pd.to_datetime(x)
-    except Exception:
-        return pd.Timestamp.max
+def _date_sort_key(s: pd.Series) -> pd.Series:
+    """Vectorized sort key: parse 'YYYY-MM-DD' strings, pushing unparseable/blank dates last."""
+    return pd.to_datetime(s, format="%Y-%m-%d", errors="coerce").fillna(pd.Timestamp.max)
 
 
 def _merge_blanks(new_blanks: pd.DataFrame):
@@ -74,11 +80,12 @@ def _merge_blanks(new_blanks: pd.DataFrame):
     Columns: summary,pdufa_date (no ticker).
     """
     cols = ["summary", "pdufa_date"]
-    nb = new_blanks.copy()[["summary", "pdufa_date"]].fillna("")
+    # Adapter columns are always plain strings, so no fillna is needed
+    nb = new_blanks[["summary", "pdufa_date"]]
 
     # Load existing
     if BLANK_CSV.exists():
-        old = pd.read_csv(BLANK_CSV, dtype=str).fillna("")
+        old = pd.read_csv(BLANK_CSV, dtype=str, engine=CSV_ENGINE, keep_default_na=False)
         for c in cols:
             if c not in old.columns:
                 old[c] = ""
@@ -89,13 +96,16 @@ def _merge_blanks(new_blanks: pd.DataFrame):
 
     # Deduplicate & sort
     combined = combined.drop_duplicates(subset=cols, keep="first")
-    combined["__sort"] = combined["pdufa_date"].apply(_date_key)
+    combined["__sort"] = _date_sort_key(combined["pdufa_date"])
     combined = combined.sort_values(["__sort", "summary"]).drop(columns="__sort")
 
-    combined.to_csv(BLANK_CSV, index=False)
+    _write_csv_atomic(combined, BLANK_CSV)
 
 
 # -------- Dynamic date resolution --------
+_DYN_DATE_RE = re.compile(r"@today([+-])(\d+)([dwmy])")
+
+
 def resolve_dynamic_date(expr: str | None, tzname: str | None) -> str | None:
     """
     Supports: None, "@today", "@today±<n><unit>" where unit in {d,w,m,y}.
@@ -118,12 +128,14 @@ def resolve_dynamic_date(expr: str | None, tzname: str | None) -> str | None:
     if expr == "@today":
         return base.isoformat()
 
-    m = re.fullmatch(r"@today([+-])(\d+)([dwmy])", expr)
+    m = _DYN_DATE_RE.fullmatch(expr)
     if m:
         sign, num, unit = m.group(1), int(m.group(2)), m.group(3)
+        # Plain timedelta covers days/weeks; relativedelta is only needed
+        # for calendar-aware month/year arithmetic.
         delta = {
-            "d": relativedelta(days=num),
-            "w": relativedelta(weeks=num),
+            "d": timedelta(days=num),
+            "w": timedelta(weeks=num),
             "m": relativedelta(months=num),
             "y": relativedelta(years=num),
         }[unit]
@@ -160,19 +172,23 @@ def main():
     )
 
     # ---- Split: resolved vs blanks ----
-    df_resolved = df_all[df_all["ticker"] != ""].copy()
-    df_blanks   = df_all[df_all["ticker"] == ""].copy()
+    # Neither slice is mutated downstream, so plain views are enough.
+    mask = df_all["ticker"] != ""
+    df_resolved = df_all.loc[mask]
+    df_blanks   = df_all.loc[~mask]
 
     # ---- Merge resolved into master CSV ----
-    df_master = read_master_df()
-    for r in df_resolved[["ticker", "pdufa_date"]].fillna("").to_dict(orient="records"):
-        r["market_cap"] = ""
-        df_master = upsert(df_master, r)
+    df_master = upsert_resolved(read_master_df(), df_resolved)
+
+    # Tickers repeat a lot; categorical codes make the sort compare ints
+    # instead of strings. Converted back to str before writing.
+    df_master["ticker"] = df_master["ticker"].astype("category")
 
     # Sort master by date then ticker
-    df_master["__sort"] = df_master["pdufa_date"].apply(_date_key)
+    df_master["__sort"] = _date_sort_key(df_master["pdufa_date"])
     df_master = df_master.sort_values(["__sort", "ticker"]).drop(columns="__sort")
-    df_master.to_csv(MASTER_CSV, index=False)
+    df_master["ticker"] = df_master["ticker"].astype(str)
+    _write_csv_atomic(df_master, MASTER_CSV)
 
     # ---- Write/merge blanks to blank.csv (summary + date only) ----
     if not df_blanks.empty: